@@ -1,7 +1,11 @@
 
+from .structure import Structure
 from .converter import str2atoms, atoms2str
-from .kpath import Kpath
+from .kpath import Kpath, scan_symmetry_tolerance
 from .phononplotter import phononPlotter
+from .extract import extract_force
+from .monitor import RunMonitor
 
-__all__ = ['str2atoms', 'atoms2str', 
-           'Kpath', 'phononPlotter']
+__all__ = ['Structure', 'str2atoms', 'atoms2str', 
+           'Kpath', 'scan_symmetry_tolerance', 'phononPlotter',
+           'extract_force', 'RunMonitor']
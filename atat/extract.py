@@ -0,0 +1,45 @@
+import os
+import json
+import numpy as np
+
+
+def extract_force(subdir=".", optjson="opt.json"):
+    """
+    Convert opt.json of a force calculation to the energy, force.out and stress.out files of ATAT.
+
+    Parameters:
+    - subdir (str): Directory containing opt.json, e.g. vol_0/p0. Default is '.'.
+    - optjson (str): Filename of the result with 'total_energy', 'forces' and 'stress'. Default is 'opt.json'.
+
+    Returns:
+    - None
+    """
+    filepath_opt = os.path.join(subdir, optjson)
+    with open(filepath_opt) as f:
+        result = json.load(f)
+    filepath = os.path.join(subdir, "energy")
+    energy = str(result["total_energy"])
+    with open(filepath, "w") as f:
+        f.write(energy)
+
+    filepath = os.path.join(subdir, "force.out")
+    forces = result["forces"]
+    with open(filepath, "w") as f:
+        for force in forces:
+            force_str = " ".join(map(str, force))
+            f.write(force_str+"\n")
+
+    # Matlantis stress is eV/A^3
+    # 1 eV/Angstrom3 = 160.21766208 GPa
+    # 10 kbar = GPa
+    filepath = os.path.join(subdir, "stress.out")
+    stress = np.array(result["stress"])
+    stress = stress*160.21766208*10  # Pa -> kbar
+    # I'm not sure, but probably this order of stress.
+    stressmatrix = [[stress[0], stress[3], stress[5]],
+                    [stress[3], stress[1], stress[4]],
+                    [stress[5], stress[4], stress[2]]]
+    with open(filepath, "w") as f:
+        for stress in stressmatrix:
+            stress_str = " ".join(map(str, stress))
+            f.write(stress_str+"\n")
@@ -4,6 +4,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pickle
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 
 def _reciprocal_lattice_vectors(cell):
@@ -60,6 +61,260 @@ def fractional_reciprocal_distance(path_info, name1, name2):
     return d
 
 
+def _shift_preserving_rotations(rotations, is_shift):
+    """
+    Select the rotations which keep a shifted reciprocal mesh invariant.
+
+    Parameters:
+    rotations (np.array): Real space rotations in fractional coordinates, shape (n, 3, 3).
+    is_shift (np.array): Half grid shift of the mesh, 0 or 1 for each axis.
+
+    Returns:
+    np.array: The rotations R for which R^T s = s (mod 2), where s is the shift.
+    """
+    rotated_shift = np.einsum('i,rij->rj', is_shift, rotations)
+    keep = np.all((rotated_shift - is_shift) % 2 == 0, axis=1)
+    return rotations[keep]
+
+
+def _mesh_preserving_rotations(rotations, mesh):
+    """
+    Select the rotations which map the reciprocal mesh onto itself and express them on the grid.
+
+    R^T acts on q = g/mesh, so on the grid address g it acts as diag(mesh) R^T diag(1/mesh).
+    The rotations for which this is not an integer matrix move a grid point off the mesh and are dropped.
+
+    Parameters:
+    rotations (np.array): Real space rotations in fractional coordinates, shape (n, 3, 3).
+    mesh (np.array): Number of divisions along each reciprocal lattice vector.
+
+    Returns:
+    np.array: The kept rotations as diag(1/mesh) R diag(mesh), whose transpose acts on grid addresses.
+    """
+    grid_rotations = np.array(rotations, dtype=float) * mesh[np.newaxis, :] / mesh[:, np.newaxis]
+    keep = np.all(np.abs(grid_rotations - np.rint(grid_rotations)) < 1e-8, axis=(1, 2))
+    return np.rint(grid_rotations[keep]).astype(int)
+
+
+def _grid_address(grid_points, mesh):
+    """
+    Convert grid point indices to grid addresses in the same convention as spglib.
+
+    Parameters:
+    grid_points (np.array): Grid point indices, the first axis runs fastest.
+    mesh (np.array): Number of divisions along each reciprocal lattice vector.
+
+    Returns:
+    np.array: Integer grid addresses of shape (n, 3), folded into [-mesh/2, mesh/2].
+    """
+    address = np.stack([grid_points % mesh[0],
+                        (grid_points // mesh[0]) % mesh[1],
+                        grid_points // (mesh[0]*mesh[1])], axis=-1)
+    address -= mesh * (address > mesh // 2)
+    return address
+
+
+def _grid_point(address, mesh):
+    """
+    Convert grid addresses to grid point indices. Inverse of _grid_address.
+
+    Parameters:
+    address (np.array): Integer grid addresses, the last axis has size 3.
+    mesh (np.array): Number of divisions along each reciprocal lattice vector.
+
+    Returns:
+    np.array: Grid point indices.
+    """
+    address = address % mesh
+    return address[..., 0] + address[..., 1]*mesh[0] + address[..., 2]*mesh[0]*mesh[1]
+
+
+def _symmetry_at_tolerance(cell, symprec, angle_tolerance, threshold=1.0e-3):
+    """
+    Analyze the symmetry of a cell with spglib and seekpath at a single tolerance.
+
+    Parameters:
+    cell (tuple): (lattice, scaled_positions, atomic_numbers) of the structure.
+    symprec (float): Distance tolerance in Angstrom.
+    angle_tolerance (float): Angle tolerance in degrees.
+    threshold (float): Tolerance of seekpath for the lattice lengths in the Bravais lattice determination.
+
+    Returns:
+    dict: Space group, number of symmetry operations, size of the primitive cell and the k-path
+          at this tolerance. 'error' is set if spglib or seekpath fails.
+    """
+    result = {'symprec': symprec, 'angle_tolerance': angle_tolerance,
+              'spacegroup_number': None, 'spacegroup_international': None, 'n_operations': None,
+              'n_primitive': None, 'bravais_lattice': None, 'path': None, 'error': None}
+    try:
+        primitive_cell = spglib.find_primitive(cell, symprec, angle_tolerance)
+        if primitive_cell is None:
+            raise RuntimeError("spglib failed to find the primitive cell.")
+        symmetry = spglib.get_symmetry(primitive_cell, symprec, angle_tolerance)
+        if symmetry is None:
+            raise RuntimeError("spglib failed to find the symmetry operations.")
+        result['n_operations'] = len(symmetry['rotations'])
+        path_info = seekpath.get_path(primitive_cell, True, "hpkot", threshold, symprec, angle_tolerance)
+    except Exception as e:
+        result['error'] = str(e)
+        return result
+    result['spacegroup_number'] = path_info['spacegroup_number']
+    result['spacegroup_international'] = path_info['spacegroup_international']
+    result['n_primitive'] = len(primitive_cell[2])
+    result['bravais_lattice'] = path_info['bravais_lattice_extended']
+    result['path'] = [tuple(segment) for segment in path_info['path']]
+    return result
+
+
+def _signature(result):
+    return (result['spacegroup_number'], result['n_primitive'], tuple(result['path']))
+
+
+def _collapse_angle_tolerances(results, symprec_list, angle_tolerance_list):
+    """
+    Choose one result for each symprec over the angle tolerances.
+
+    If the angle tolerances give different symmetry, the result with the fewest symmetry operations
+    is chosen, so that a symmetry found only with a loose angle tolerance is not supported.
+
+    Parameters:
+    results (list): Results of _symmetry_at_tolerance on the grid.
+    symprec_list (list): Sorted distance tolerances.
+    angle_tolerance_list (list): Angle tolerances, the earlier one is chosen among equal symmetry.
+
+    Returns:
+    list: The chosen result for each symprec, or None if every angle tolerance failed.
+    """
+    collapsed = []
+    for symprec in symprec_list:
+        succeeded = [result for angle_tolerance in angle_tolerance_list for result in results
+                     if result['symprec'] == symprec and result['angle_tolerance'] == angle_tolerance
+                     and result['error'] is None]
+        if len(succeeded) == 0:
+            collapsed.append(None)
+        else:
+            collapsed.append(min(succeeded, key=lambda result: result['n_operations']))
+    return collapsed
+
+
+def _symprec_plateaus(symprec_list, collapsed):
+    """
+    Split the results collapsed over the angle tolerances into plateaus of the same symmetry.
+
+    A plateau is a run of neighbouring symprec values which give the same space group,
+    primitive cell size and k-path. Each symprec value covers the interval in log10(symprec)
+    between the midpoints to its neighbours, and the width of a plateau is the sum of them in decades.
+
+    Parameters:
+    symprec_list (list): Sorted distance tolerances.
+    collapsed (list): Results of _collapse_angle_tolerances.
+
+    Returns:
+    list: (width, results in the plateau) for each plateau. Failed tolerances are not included.
+    """
+    logs = np.log10(symprec_list)
+    if len(logs) > 1:
+        edges = np.concatenate([[1.5*logs[0] - 0.5*logs[1]], (logs[1:] + logs[:-1])/2,
+                                [1.5*logs[-1] - 0.5*logs[-2]]])
+    else:
+        edges = np.array([logs[0], logs[0]])
+    widths = np.diff(edges)
+
+    plateaus = []
+    run = []
+    for i, result in enumerate(collapsed):
+        if len(run) > 0 and (result is None or _signature(result) != _signature(collapsed[run[0]])):
+            plateaus.append(run)
+            run = []
+        if result is not None:
+            run.append(i)
+    if len(run) > 0:
+        plateaus.append(run)
+    return [(float(widths[run].sum()), [collapsed[i] for i in run]) for run in plateaus]
+
+
+def scan_symmetry_tolerance(atoms, symprec_list=(1.0e-5, 3.0e-5, 1.0e-4, 3.0e-4, 1.0e-3, 3.0e-3, 1.0e-2, 3.0e-2, 1.0e-1),
+                            angle_tolerance_list=(-1.0, 1.0), threshold=1.0e-3, min_width=0.9, max_workers=None):
+    """
+    Run spglib and seekpath over a grid of symmetry tolerances in parallel.
+
+    A structure whose space group or primitive cell changes with the tolerance is a sign
+    that the k-path and the supercells made from it are not reliable.
+    For each symprec, the angle tolerances must agree on the symmetry, otherwise the lower one is taken
+    (see _collapse_angle_tolerances). The stability of a tolerance is the width in decades of log10(symprec)
+    of the plateau giving the same space group, primitive cell size and k-path (see _symprec_plateaus).
+    Only the plateaus at least min_width wide are regarded as stable, and among them the one
+    with the most symmetry operations is chosen, so that the symmetry lost by numerical noise
+    at small symprec is recovered, but not the symmetry found only with a loose angle tolerance.
+    The wider plateau and then the smaller primitive cell are preferred.
+    If no plateau is wide enough, the widest one is chosen. The chosen setting is the middle of the plateau.
+
+    Parameters:
+    atoms (ase.Atoms): Atoms object to be analyzed.
+    symprec_list (list): Distance tolerances in Angstrom.
+    angle_tolerance_list (list): Angle tolerances in degrees. A negative value is spglib's default.
+    threshold (float): Tolerance of seekpath for the lattice lengths. It is not scanned. Default is 1.0e-3.
+    min_width (float): Minimum width of a plateau in decades of symprec.
+                       Default is 0.9, two neighbouring values of the default symprec_list.
+    max_workers (int): Number of processes. Default is the number of CPUs.
+                       With 1, the scan runs serially in this process.
+
+    Returns:
+    list: Results for each tolerance as a dict with 'stability' added.
+    dict: The chosen result, or None if every tolerance failed.
+    """
+    cell = (np.array(atoms.cell), atoms.get_scaled_positions(), atoms.get_atomic_numbers())
+    symprec_list = sorted(symprec_list)
+    grid = [(symprec, angle_tolerance) for symprec in symprec_list for angle_tolerance in angle_tolerance_list]
+    if max_workers == 1:
+        results = [_symmetry_at_tolerance(cell, symprec, angle_tolerance, threshold)
+                   for symprec, angle_tolerance in grid]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_symmetry_at_tolerance, cell, symprec, angle_tolerance, threshold)
+                       for symprec, angle_tolerance in grid]
+            results = [future.result() for future in futures]
+
+    plateaus = _symprec_plateaus(symprec_list, _collapse_angle_tolerances(results, symprec_list, angle_tolerance_list))
+    for result in results:
+        result['stability'] = 0.0
+        for width, plateau in plateaus:
+            if result['error'] is None and any(result['symprec'] == chosen['symprec'] and
+                                               _signature(result) == _signature(chosen) for chosen in plateau):
+                result['stability'] = width
+
+    if len(plateaus) == 0:
+        return results, None
+    wide_plateaus = [(width, plateau) for width, plateau in plateaus if width >= min_width]
+    if len(wide_plateaus) > 0:
+        width, plateau = max(wide_plateaus, key=lambda item: (item[1][0]['n_operations'], item[0],
+                                                              -item[1][0]['n_primitive']))
+    else:
+        width, plateau = max(plateaus, key=lambda item: (item[0], -item[1][0]['n_primitive']))
+    best = plateau[(len(plateau) - 1)//2]
+    return results, best
+
+
+def _grid_star(grid_points, mesh, is_shift, rotations):
+    """
+    Rotate grid points on the mesh.
+
+    Parameters:
+    grid_points (np.array): Grid point indices.
+    mesh (np.array): Number of divisions along each reciprocal lattice vector.
+    is_shift (np.array): Half grid shift of the mesh, 0 or 1 for each axis.
+    rotations (np.array): Rotations on the grid from _mesh_preserving_rotations and _shift_preserving_rotations.
+
+    Returns:
+    np.array: Grid addresses of grid_points, shape (n, 3).
+    np.array: Grid point indices of the rotated grid points, shape (n, n_rotations).
+    """
+    address = _grid_address(grid_points, mesh)
+    # rotate the doubled address, q -> R^T q.
+    rotated = np.einsum('ni,rij->nrj', 2*address + is_shift, rotations)
+    return address, _grid_point((rotated - is_shift)//2, mesh)
+
+
 class Kpath:
     """
     Class to manage k-path generation and manipulation for band structure calculations.
@@ -68,18 +323,26 @@ class Kpath:
     atoms (ase.Atoms): Atoms object containing the atomic structure.
     """
 
-    def __init__(self, atoms):
+    def __init__(self, atoms, symprec=1.0e-3, angle_tolerance=1.0, threshold=1.0e-3):
         """
         Initialize the Kpath object using an atomic structure.
 
         Parameters:
         atoms (ase.Atoms): Atoms object from which to generate the k-path.
+        symprec (float): Distance tolerance of the symmetry search in Angstrom. Default is 1.0e-3.
+        angle_tolerance (float): Angle tolerance of the symmetry search in degrees. Default is 1.0.
+        threshold (float): Tolerance of seekpath for the lattice lengths in the Bravais lattice determination. Default is 1.0e-3.
         """
         self.atoms = atoms
+        self.symprec = symprec
+        self.angle_tolerance = angle_tolerance
+        self.threshold = threshold
         self.cell = (atoms.cell, atoms.get_scaled_positions(), atoms.get_atomic_numbers())
-        self.primitive_cell = spglib.find_primitive(self.cell)
-        self.cellinfo = spglib.get_symmetry_dataset(self.primitive_cell)
-        self.path_info = seekpath.get_path(self.primitive_cell, True, "hpkot", 1.0e-3, 1.0e-3, 1.0)
+        self.primitive_cell = spglib.find_primitive(self.cell, symprec, angle_tolerance)
+        if self.primitive_cell is None:
+            raise RuntimeError(f"spglib failed to find the primitive cell, symprec={symprec} angle_tolerance={angle_tolerance}")
+        self.cellinfo = spglib.get_symmetry_dataset(self.primitive_cell, symprec, angle_tolerance)
+        self.path_info = seekpath.get_path(self.primitive_cell, True, "hpkot", threshold, symprec, angle_tolerance)
         print("path_info", self.path_info)
         self.M = np.matrix(_reciprocal_lattice_vectors(self.path_info.get('conv_lattice')))
 
@@ -180,6 +443,92 @@ class Kpath:
         with open(filename, "w", encoding="utf-8") as f:
             f.write("\n".join(kpath_list)+"\n")
 
+    def _qmesh_rotations(self, mesh, shift, is_time_reversal):
+        """
+        Return the rotations of the primitive cell acting on the grid addresses of the mesh.
+        """
+        symmetry = spglib.get_symmetry(self.primitive_cell, self.symprec, self.angle_tolerance)
+        rotations = _mesh_preserving_rotations(symmetry['rotations'], mesh)
+        rotations = _shift_preserving_rotations(rotations, shift)
+        if is_time_reversal:
+            rotations = np.concatenate([rotations, -rotations])
+        return rotations
+
+    def gen_qmesh(self, mesh, is_shift=(0, 0, 0), is_time_reversal=True, chunk_size=4096):
+        """
+        Generate the irreducible q-points of a uniform mesh and their weights.
+
+        The mesh is defined on the reciprocal lattice of the primitive cell and is reduced
+        by the rotations in the symmetry dataset of the primitive cell.
+        Only the rotations which map the mesh, including its shift, onto itself are used,
+        so a mesh of lower symmetry than the lattice gives more irreducible q-points.
+        Each grid point is mapped to the smallest grid point index in its star.
+
+        Parameters:
+        mesh (list): Number of divisions along each reciprocal lattice vector.
+        is_shift (list): Half grid shift along each axis, 0 or 1. Default is no shift.
+        is_time_reversal (bool): Use time reversal symmetry, q and -q are equivalent. Default is True.
+        chunk_size (int): Number of mesh points rotated at once. Default is 4096.
+
+        Returns:
+        np.array: Irreducible q-points in fractional coordinates, shape (n_ir, 3).
+        np.array: Integer weights of the irreducible q-points. They sum to the number of mesh points.
+        np.array: Index of the irreducible q-point for each point of the full mesh.
+        """
+        mesh = np.array(mesh, dtype=int)
+        shift = np.array(is_shift, dtype=int)
+        rotations = self._qmesh_rotations(mesh, shift, is_time_reversal)
+
+        n_grid = int(np.prod(mesh))
+        mapping = np.empty(n_grid, dtype=int)
+        for start in range(0, n_grid, chunk_size):
+            grid_points = np.arange(start, min(start+chunk_size, n_grid))
+            _, star = _grid_star(grid_points, mesh, shift, rotations)
+            mapping[start:start+len(grid_points)] = star.min(axis=1)
+        ir_grid_points, ir_mapping, weights = np.unique(mapping, return_inverse=True, return_counts=True)
+        grid_address = _grid_address(np.arange(n_grid), mesh)
+        qpoints = (grid_address[ir_grid_points] + shift*0.5) / mesh
+
+        self.qmesh_info = {'mesh': mesh, 'is_shift': shift,
+                           'grid_address': grid_address,
+                           'ir_grid_points': ir_grid_points,
+                           'qpoints': qpoints, 'weights': weights,
+                           'mapping': ir_mapping.reshape(-1)}
+        return qpoints, weights, self.qmesh_info['mapping']
+
+    def iter_qmesh(self, mesh, is_shift=(0, 0, 0), is_time_reversal=True, chunk_size=4096):
+        """
+        Iterate over the irreducible q-points of a uniform mesh chunk by chunk.
+
+        The same irreducible set as gen_qmesh is generated, but the full mesh is never held in memory.
+        A grid point is irreducible if its index is the smallest one in its star,
+        and its weight is the number of distinct grid points in the star.
+
+        Parameters:
+        mesh (list): Number of divisions along each reciprocal lattice vector.
+        is_shift (list): Half grid shift along each axis, 0 or 1. Default is no shift.
+        is_time_reversal (bool): Use time reversal symmetry, q and -q are equivalent. Default is True.
+        chunk_size (int): Number of mesh points examined at once. Default is 4096.
+
+        Yields:
+        np.array: Irreducible q-points of the chunk in fractional coordinates.
+        np.array: Integer weights of these q-points.
+        """
+        mesh = np.array(mesh, dtype=int)
+        shift = np.array(is_shift, dtype=int)
+        rotations = self._qmesh_rotations(mesh, shift, is_time_reversal)
+
+        n_grid = int(np.prod(mesh))
+        for start in range(0, n_grid, chunk_size):
+            grid_points = np.arange(start, min(start+chunk_size, n_grid))
+            address, star = _grid_star(grid_points, mesh, shift, rotations)
+            is_ir = star.min(axis=1) == grid_points
+            if not is_ir.any():
+                continue
+            star = np.sort(star[is_ir], axis=1)
+            weights = 1 + np.count_nonzero(np.diff(star, axis=1), axis=1)
+            yield (address[is_ir] + shift*0.5) / mesh, weights
+
     def validate_unit(self, unit="THz"):
         unit_lower = unit.lower()
         if unit_lower not in ["thz", "ev","mev"]:
@@ -280,6 +629,12 @@ class Kpath:
 """
 Usage:
 
+If the structure doesn't work well, check the symmetry tolerance at first.
+The scan starts worker processes, so call it under the guard, or with max_workers=1.
+if __name__ == "__main__":
+    results, best = scan_symmetry_tolerance(atoms)
+    kpath = Kpath(atoms, symprec=best['symprec'], angle_tolerance=best['angle_tolerance'])
+
 PARENT_DIR = "/home/user/work/Pt_fcc"
 filepath = os.path.join(PARENT_DIR, "opt.vasp")
 print("load",filepath)
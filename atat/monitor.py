@@ -0,0 +1,274 @@
+import asyncio
+import glob
+import os
+import shutil
+import time
+import matplotlib.pyplot as plt
+from ase.io import read
+
+from .converter import atoms2str
+from .extract import extract_force
+from .phononplotter import phononPlotter
+
+try:
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
+
+
+def _extract_subdir(subdir, optjson="opt.json", poscar="POSCAR", strout="str_relax.out"):
+    """
+    Prepare a single vol_*/p* directory for fitfc, the same as the loop in step2.sh.
+
+    Parameters:
+    - subdir (str): The vol_*/p* directory.
+    - optjson (str): Filename of the force calculation result. Default is 'opt.json'.
+    - poscar (str): Filename of the calculated structure. Default is 'POSCAR'.
+    - strout (str): Output structure file name. Default is 'str_relax.out'.
+    """
+    poscar_path = os.path.join(subdir, poscar)
+    if os.path.exists(poscar_path):
+        atoms2str(read(poscar_path, format='vasp'), os.path.join(subdir, strout))
+    extract_force(subdir=subdir, optjson=optjson)
+
+
+class RunMonitor:
+    """
+    Class to watch a force campaign and process the results as the directories finish.
+
+    opt.json in vol_*/p* is converted to the ATAT files as soon as it appears.
+    When every p* directory of a volume is extracted, energy and str_relax.out of parent_dir are copied
+    to the volume and the postprocess command (e.g. fitfc) is run in parent_dir.
+    Then the phononPlotter figures of the volume are rendered from the files which exist.
+
+    File changes are watched with watchfiles (inotify) if it is installed, otherwise the tree is polled.
+
+    Attributes:
+    - parent_dir (str): Path to the directory containing vol_*/.
+    - extracted (dict): The p* directories already extracted -> modification time of their opt.json.
+    - completed_volumes (set): The vol_* directories already completed.
+    """
+    def __init__(self, parent_dir, optjson="opt.json", postprocess=None, poll_interval=10.0, use_inotify=True):
+        """
+        Initialize the RunMonitor class with a specific parent directory.
+
+        Parameters:
+        - parent_dir (str): Directory containing vol_*/.
+        - optjson (str): Filename of the force calculation result. Default is 'opt.json'.
+        - postprocess (str): Shell command run in parent_dir when a volume is complete. Default is None.
+        - poll_interval (float): Interval of polling in seconds, used without inotify. Default is 10.0.
+        - use_inotify (bool): Use watchfiles if it is installed. Default is True.
+        """
+        self.parent_dir = parent_dir
+        self.optjson = optjson
+        self.postprocess = postprocess
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and awatch is not None
+        self.plotter = phononPlotter(parent_dir)
+        self.volumes = {}
+        self.extracted = {}
+        self.completed_volumes = set()
+        self.start_time = None
+        self.n_extracted_at_start = 0
+
+    def _scan(self):
+        """
+        List the p* directories of each vol_* directory.
+
+        Returns:
+        - dict: vol_* directory -> sorted list of its p* directories.
+        """
+        volumes = {}
+        for vol_dir in sorted(glob.glob(os.path.join(self.parent_dir, "vol_*"))):
+            volumes[vol_dir] = sorted(subdir for subdir in glob.glob(os.path.join(vol_dir, "p*"))
+                                      if os.path.isdir(subdir))
+        return volumes
+
+    def _optjson_mtime(self, subdir):
+        """
+        Return the modification time of opt.json in subdir in ns, or None if it doesn't exist.
+        """
+        try:
+            return os.stat(os.path.join(subdir, self.optjson)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    async def _extract(self, subdirs):
+        """
+        Extract the p* directories concurrently in threads.
+
+        opt.json which is still being written fails to be read, and it is retried at the next update.
+
+        Parameters:
+        - subdirs (dict): p* directory -> modification time of its opt.json before the extraction.
+
+        Returns:
+        - list: The p* directories extracted successfully.
+        """
+        loop = asyncio.get_running_loop()
+        tasks = [loop.run_in_executor(None, _extract_subdir, subdir, self.optjson) for subdir in subdirs]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        extracted = []
+        for (subdir, mtime), result in zip(subdirs.items(), results):
+            if isinstance(result, Exception):
+                print("failed to extract", subdir, result)
+            else:
+                self.extracted[subdir] = mtime
+                extracted.append(subdir)
+        return extracted
+
+    async def _on_volume_complete(self, vol_dir):
+        """
+        Run the postprocess command and render the figures of a completed volume.
+
+        energy and str_relax.out of parent_dir are copied to vol_dir before postprocess, as in step2.sh.
+        """
+        print("complete", vol_dir)
+        for filename in ["energy", "str_relax.out"]:
+            filepath = os.path.join(self.parent_dir, filename)
+            if os.path.exists(filepath):
+                shutil.copy(filepath, vol_dir)
+        if self.postprocess is not None:
+            process = await asyncio.create_subprocess_shell(self.postprocess, cwd=self.parent_dir)
+            returncode = await process.wait()
+            if returncode != 0:
+                print("postprocess failed, returncode=", returncode)
+        try:
+            self.plot(vol_dir)
+        except Exception as e:
+            # the monitor keeps running, the figures are rendered again by plot().
+            print("failed to plot", vol_dir, e)
+            plt.close("all")
+
+    def plot(self, vol_dir):
+        """
+        Render the dispersion, DOS and free energy figures whose data files exist.
+
+        The figures are saved in vol_dir, except the free energy figure saved in parent_dir.
+
+        Parameters:
+        - vol_dir (str): The vol_* directory.
+        """
+        vol = os.path.basename(vol_dir)
+        if os.path.exists(os.path.join(vol_dir, "eigenfreq.out")) and \
+                os.path.exists(os.path.join(self.parent_dir, "kpath_info.pickle")):
+            self.plotter.plot_dispersion(filename=os.path.join(vol, "eigenfreq.out"),
+                                         filename_png=os.path.join(vol_dir, "eigenfreq.png"))
+        if os.path.exists(os.path.join(vol_dir, "vdos.out")):
+            self.plotter.plot_dos(filename=os.path.join(vol, "vdos.out"),
+                                  filename_png=os.path.join(vol_dir, "dos.png"))
+        if os.path.exists(os.path.join(self.parent_dir, "fvib")):
+            self.plotter.plot_freeenergy(filename="fvib",
+                                         filename_png=os.path.join(self.parent_dir, "freeenergy.png"))
+        plt.close("all")
+
+    async def update(self):
+        """
+        Extract the new opt.json files and process the volumes completed by them.
+
+        opt.json rewritten by a restarted calculation is extracted again,
+        and its volume is processed again.
+        """
+        self.volumes = self._scan()
+        for vol_dir, subdirs in self.volumes.items():
+            new_subdirs = {}
+            for subdir in subdirs:
+                mtime = self._optjson_mtime(subdir)
+                if mtime is not None and self.extracted.get(subdir) != mtime:
+                    new_subdirs[subdir] = mtime
+            if len(new_subdirs) > 0:
+                if len(await self._extract(new_subdirs)) > 0:
+                    self.completed_volumes.discard(vol_dir)
+            if vol_dir not in self.completed_volumes and len(subdirs) > 0 and \
+                    all(subdir in self.extracted for subdir in subdirs):
+                self.completed_volumes.add(vol_dir)
+                await self._on_volume_complete(vol_dir)
+        self.print_status()
+
+    def status(self):
+        """
+        Return the progress of the campaign.
+
+        Returns:
+        - dict: 'volumes' (vol_* -> [n_extracted, n_subdirs]), 'n_extracted', 'n_total',
+                'elapsed' in seconds and 'throughput' in directories per hour,
+                both counted after the directories already finished at the start of the monitor.
+        """
+        volumes = {}
+        for vol_dir, subdirs in self.volumes.items():
+            volumes[vol_dir] = [sum(subdir in self.extracted for subdir in subdirs), len(subdirs)]
+        n_extracted = sum(n for n, _ in volumes.values())
+        n_total = sum(n for _, n in volumes.values())
+        elapsed = 0.0 if self.start_time is None else time.monotonic() - self.start_time
+        throughput = 0.0
+        if elapsed > 0:
+            throughput = (len(self.extracted) - self.n_extracted_at_start) / elapsed * 3600
+        return {'volumes': volumes, 'n_extracted': n_extracted, 'n_total': n_total,
+                'elapsed': elapsed, 'throughput': throughput}
+
+    def print_status(self):
+        status = self.status()
+        volumes = " ".join(f"{os.path.basename(vol_dir)}:{n}/{total}"
+                           for vol_dir, (n, total) in status['volumes'].items())
+        print(f"{status['n_extracted']}/{status['n_total']} {volumes} "
+              f"elapsed={status['elapsed']:.0f}s throughput={status['throughput']:.1f}/h")
+
+    def is_complete(self):
+        return len(self.volumes) > 0 and all(vol_dir in self.completed_volumes for vol_dir in self.volumes)
+
+    async def _changes(self):
+        """
+        Yield when opt.json may have been written.
+        """
+        if self.use_inotify:
+            optjson = self.optjson
+            async for changes in awatch(self.parent_dir, recursive=True,
+                                        watch_filter=lambda change, path: os.path.basename(path) == optjson):
+                yield changes
+        else:
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                yield None
+
+    async def run(self, stop_when_complete=True):
+        """
+        Watch parent_dir and process the results until every volume is complete.
+
+        Parameters:
+        - stop_when_complete (bool): Return when every vol_* directory is complete. Default is True.
+        """
+        await self.update()
+        self.start_time = time.monotonic()
+        self.n_extracted_at_start = len(self.extracted)
+        if stop_when_complete and self.is_complete():
+            return
+        async for _ in self._changes():
+            await self.update()
+            if stop_when_complete and self.is_complete():
+                return
+
+    def watch(self, timeout=None, stop_when_complete=True):
+        """
+        Run the monitor in a new event loop.
+
+        Parameters:
+        - timeout (float): Stop after timeout seconds. Default is None, no limit.
+        - stop_when_complete (bool): Return when every vol_* directory is complete. Default is True.
+        """
+        async def main():
+            try:
+                await asyncio.wait_for(self.run(stop_when_complete), timeout)
+            except asyncio.TimeoutError:
+                print("timeout")
+        asyncio.run(main())
+
+
+"""
+Usage:
+
+PARENT_DIR = "/home/user/work/Pt_fcc"
+
+from atat.monitor import RunMonitor
+monitor = RunMonitor(PARENT_DIR, postprocess="fitfc -f -fr=10 -fn -dT=10 && fitfc -f -fr=10 -df=kpath -fn")
+monitor.watch()
+"""
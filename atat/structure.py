@@ -0,0 +1,159 @@
+from ase import Atoms
+from ase.data import atomic_numbers, chemical_symbols
+from ase.symbols import Symbols
+import numpy as np
+
+
+class Structure:
+    """
+    Compact periodic structure held as contiguous NumPy arrays.
+
+    It is used by the converters instead of per-atom ase.Atom objects.
+
+    Attributes:
+    - cell (np.array): Lattice vectors as rows, shape (3, 3).
+    - scaled_positions (np.array): Fractional coordinates, shape (n, 3).
+    - numbers (np.array): Atomic numbers, shape (n,).
+    """
+    __slots__ = ('cell', 'scaled_positions', 'numbers')
+
+    def __init__(self, cell, scaled_positions, numbers):
+        """
+        Initialize the Structure from arrays. Arrays of the right dtype are not copied.
+
+        Parameters:
+        - cell (array-like): Lattice vectors as rows.
+        - scaled_positions (array-like): Fractional coordinates.
+        - numbers (array-like): Atomic numbers.
+        """
+        self.cell = np.asarray(cell, dtype=float).reshape(3, 3)
+        self.scaled_positions = np.asarray(scaled_positions, dtype=float).reshape(-1, 3)
+        self.numbers = np.asarray(numbers, dtype=int).reshape(-1)
+        if len(self.numbers) != len(self.scaled_positions):
+            raise ValueError(f'len(numbers)={len(self.numbers)} != len(scaled_positions)={len(self.scaled_positions)}')
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __repr__(self):
+        return f'Structure(natoms={len(self)}, formula={Symbols(self.numbers).get_chemical_formula()})'
+
+    @classmethod
+    def from_atoms(cls, atoms):
+        """
+        Make a Structure from an ASE Atoms object.
+
+        The cell and the atomic numbers share memory with atoms.
+        The fractional coordinates are computed, because Atoms holds Cartesian positions.
+
+        Parameters:
+        - atoms (Atoms): An ASE Atoms object.
+
+        Returns:
+        - Structure: The structure, the positions are not wrapped.
+        """
+        return cls(atoms.cell.array, atoms.get_scaled_positions(wrap=False), atoms.numbers)
+
+    def to_atoms(self, pbc=True):
+        """
+        Make an ASE Atoms object.
+
+        Parameters:
+        - pbc (bool): Periodic boundary condition. Default is True.
+
+        Returns:
+        - Atoms: An ASE Atoms object.
+        """
+        return Atoms(numbers=self.numbers, cell=self.cell, scaled_positions=self.scaled_positions, pbc=pbc)
+
+    @property
+    def positions(self):
+        """
+        Cartesian positions, shape (n, 3).
+        """
+        return self.scaled_positions @ self.cell
+
+    def symbols(self):
+        """
+        Return the chemical symbols of the atoms.
+
+        Returns:
+        - list: Chemical symbol of each atom.
+        """
+        return [chemical_symbols[number] for number in self.numbers]
+
+    def sort(self):
+        """
+        Reorder the atoms by atomic number. The order of the atoms with the same atomic number is kept.
+
+        Returns:
+        - Structure: A new Structure with the atoms grouped by atomic number.
+        """
+        order = np.argsort(self.numbers, kind='stable')
+        return Structure(self.cell, self.scaled_positions[order], self.numbers[order])
+
+    def wrap(self, eps=1e-4):
+        """
+        Move all atoms into the cell. Fractional coordinates within eps of 1 are set to 0.
+
+        Parameters:
+        - eps (float): Tolerance for a fractional coordinate to be regarded as 1. Default is 1e-4.
+
+        Returns:
+        - Structure: A new Structure with the wrapped positions.
+        """
+        spos = self.scaled_positions % 1.0
+        spos[np.abs(spos - 1) < eps] = 0.0
+        return Structure(self.cell, spos, self.numbers)
+
+    def transform(self, matrix):
+        """
+        Change the lattice vectors to matrix @ cell keeping the Cartesian positions.
+
+        Parameters:
+        - matrix (array-like): 3x3 transformation matrix of the lattice vectors.
+
+        Returns:
+        - Structure: A new Structure with the new cell. The positions are not wrapped.
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        return Structure(matrix @ self.cell, self.scaled_positions @ np.linalg.inv(matrix), self.numbers)
+
+    @classmethod
+    def read_str(cls, file='str.out'):
+        """
+        Read a structure output file (str.out) of ATAT. See str2atoms for the format.
+
+        Parameters:
+        - file (str): Path to the structure output file. Default is 'str.out'.
+
+        Returns:
+        - Structure: The structure, the positions are not wrapped.
+        """
+        with open(file, 'r') as f:
+            lines = [line.split() for line in f if line.strip()]
+
+        # the cooridinate system vectors: A, B, C and the lattice vectors: U, V, W
+        GCS = np.array(lines[0:3], dtype=float)
+        UVW = np.array(lines[3:6], dtype=float)
+        unitcell = UVW @ GCS
+
+        # each line is [a,b,c] in terms of the global coordinates
+        coords = np.array([fields[0:3] for fields in lines[6:]], dtype=float).reshape(-1, 3)
+        numbers = [atomic_numbers[fields[-1]] for fields in lines[6:]]
+        scaled_positions = coords @ GCS @ np.linalg.inv(unitcell)
+        return cls(unitcell, scaled_positions, numbers)
+
+    def write_str(self, strout='str.out'):
+        """
+        Write a structure output file (str.out) of ATAT. The coordinate system is the unit matrix.
+
+        Parameters:
+        - strout (str): The output file path. Default is 'str.out'.
+        """
+        lines = ['%1.5f %1.5f %1.5f' % tuple(vector) for vector in self.cell]
+        lines.extend(['1.0 0.0 0.0', '0.0 1.0 0.0', '0.0 0.0 1.0'])  # It should be.
+        lines.extend(['%1.5f %1.5f %1.5f %s' % (x, y, z, symbol)
+                      for (x, y, z), symbol in zip(self.scaled_positions.tolist(), self.symbols())])
+        with open(strout, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
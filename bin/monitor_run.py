@@ -0,0 +1,22 @@
+import argparse
+from atat import RunMonitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch vol_*/p* and extract opt.json as soon as it appears.')
+    parser.add_argument('parent_dir', type=str, nargs='?', default='.', help='Directory containing vol_*/ (default: .).')
+    parser.add_argument('--optjson', type=str, default='opt.json', help='opt.json file name (default: opt.json).')
+    parser.add_argument('--postprocess', type=str, default=None,
+                        help='Shell command run in parent_dir when a volume is complete, e.g. fitfc.')
+    parser.add_argument('--poll_interval', type=float, default=10.0, help='Polling interval in seconds (default: 10).')
+    parser.add_argument('--no_inotify', action='store_true', help='Poll even if watchfiles is installed.')
+    parser.add_argument('--timeout', type=float, default=None, help='Stop after this many seconds.')
+    args = parser.parse_args()
+
+    monitor = RunMonitor(args.parent_dir, optjson=args.optjson, postprocess=args.postprocess,
+                         poll_interval=args.poll_interval, use_inotify=not args.no_inotify)
+    monitor.watch(timeout=args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+from ase.io import read
+from atat import scan_symmetry_tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the space group and the primitive cell over symmetry tolerances.')
+    parser.add_argument('structure', type=str, help='Path to the structure file, e.g. opt.vasp.')
+    parser.add_argument('--format', type=str, default=None, help='File format of ase.io.read (default: guessed).')
+    parser.add_argument('--symprec', type=float, nargs='+', default=None,
+                        help='Distance tolerances in Angstrom (default: 1e-5 to 1e-1 in half decades).')
+    parser.add_argument('--angle_tolerance', type=float, nargs='+', default=None,
+                        help='Angle tolerances in degrees, -1 is spglib\'s default. The lowest symmetry among them '
+                             'is taken, so a loose one cannot raise the symmetry (default: -1 1).')
+    parser.add_argument('--threshold', type=float, default=1.0e-3,
+                        help='Tolerance of seekpath for the lattice lengths (default: 1e-3).')
+    parser.add_argument('--min_width', type=float, default=0.9,
+                        help='Minimum width of a stable plateau in decades of symprec (default: 0.9).')
+    parser.add_argument('--nproc', type=int, default=None,
+                        help='Number of processes, 1 runs serially (default: number of CPUs).')
+    args = parser.parse_args()
+
+    kwargs = {'threshold': args.threshold, 'min_width': args.min_width, 'max_workers': args.nproc}
+    if args.symprec is not None:
+        kwargs['symprec_list'] = args.symprec
+    if args.angle_tolerance is not None:
+        kwargs['angle_tolerance_list'] = args.angle_tolerance
+
+    atoms = read(args.structure, format=args.format)
+    results, best = scan_symmetry_tolerance(atoms, **kwargs)
+
+    print(f"{'symprec':>10} {'angle':>6} {'space group':>12} {'number':>6} {'n_op':>4} {'n_prim':>6} {'stability':>9}")
+    for result in results:
+        if result['error'] is not None:
+            print(f"{result['symprec']:>10.1e} {result['angle_tolerance']:>6.1f} error: {result['error']}")
+            continue
+        print(f"{result['symprec']:>10.1e} {result['angle_tolerance']:>6.1f} {result['spacegroup_international']:>12} "
+              f"{result['spacegroup_number']:>6} {result['n_operations']:>4} {result['n_primitive']:>6} "
+              f"{result['stability']:>9.2f}")
+
+    if best is None:
+        print("every tolerance failed.")
+    else:
+        print(f"best: symprec={best['symprec']} angle_tolerance={best['angle_tolerance']} "
+              f"{best['spacegroup_international']} ({best['spacegroup_number']}) n_primitive={best['n_primitive']}")
+
+
+if __name__ == "__main__":
+    main()